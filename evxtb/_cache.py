@@ -0,0 +1,93 @@
+"""Persistent cache of xtb total energies."""
+import dbm
+import functools
+import hashlib
+import importlib.metadata
+import os
+import re
+import shelve
+import subprocess
+import warnings
+from contextlib import contextmanager
+from pathlib import Path
+
+CACHE_DIR = Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache")) / "evxtb"
+
+
+_VERSION_RE = re.compile(rb"xtb version (\S+)")
+
+
+@functools.lru_cache(maxsize=None)
+def xtb_version(backend="xtb"):
+    """Find the version of xtb used by a backend.
+
+    Args:
+        backend (str): Either "xtb", for the xtb program, or "xtb-python".
+
+    Returns:
+        version (str): The xtb version, or "unknown" if it cannot be found.
+
+    """
+    if backend == "xtb-python":
+        try:
+            return importlib.metadata.version("xtb")
+        except importlib.metadata.PackageNotFoundError:
+            return "unknown"
+
+    try:
+        res = subprocess.run(
+            ["xtb", "--version"], stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+        )
+    except OSError:
+        return "unknown"
+    match = _VERSION_RE.search(res.stdout)
+    return "unknown" if match is None else match.group(1).decode()
+
+
+def cache_key(buffer, backend="xtb", version="unknown"):
+    """Hash the input that would be fed to xtb.
+
+    The key covers the input cell, the backend the energy is calculated with
+    and the xtb version. It does not cover the parameter files xtb reads, so
+    the cache should be cleared after editing those by hand.
+
+    Args:
+        buffer (str): The contents of the xtb input file.
+        backend (str): The backend the GFN0 xTB energy is calculated with.
+        version (str): The version of xtb, see :func:`xtb_version`.
+
+    Returns:
+        key (str): The cache key of the calculation.
+
+    """
+    header = f"gfn0\n{backend}\n{version}\n"
+    return hashlib.blake2b((header + buffer).encode(), digest_size=16).hexdigest()
+
+
+@contextmanager
+def open_cache(location=None):
+    """Open the energy cache, creating it if it does not exist.
+
+    If the cache cannot be opened, e.g. because the directory is not writable
+    or another process holds the lock, a warning is given and an empty,
+    throwaway mapping is used instead, so the calculation carries on.
+
+    Args:
+        location (str, optional): The cache directory. Defaults to
+            ``$XDG_CACHE_HOME/evxtb``.
+
+    Yields:
+        cache (:obj:`shelve.Shelf`): The mapping of cache keys to energies.
+
+    """
+    location = CACHE_DIR if location is None else Path(location)
+    try:
+        location.mkdir(parents=True, exist_ok=True)
+        cache = shelve.open(str(location / "energies"))
+    except (OSError, *dbm.error) as err:
+        warnings.warn(f"Energy cache in {location} is unavailable, not using it: {err}")
+        yield {}
+        return
+
+    with cache:
+        yield cache
@@ -1,31 +1,56 @@
+import functools
+import io
 import os
 import re
+import shutil
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
 from pathlib import Path
-from typing import Generator
+from tempfile import mkdtemp
+from typing import Generator, NamedTuple
 
-from ase.eos import EquationOfState
+from ase.eos import EquationOfState, murnaghan
 from ase.units import kJ, Hartree, eV
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 import numpy as np
+from scipy.optimize import curve_fit
+
+from ._cache import cache_key, open_cache, xtb_version
+
+_H2EV = Hartree / eV
+_KJ_TO_GPa = 1.0e24 / kJ
+
+# The ways the xtb energies can be calculated.
+BACKENDS = ("xtb", "xtb-python")
+
+_TOTAL_E_RE = re.compile(r"TOTAL ENERGY\s+(-?\d+\.\d+)")
+_TOTAL_E_RE_BYTES = re.compile(rb"TOTAL ENERGY\s+(-?\d+\.\d+)")
+# The summary block holding the total energy sits at the end of the xtb output.
+_XTB_TAIL = 4096
+
+# The last fitted equation of state parameters for each plot name.
+_LAST_FIT = {}
+
+# The figure E(V) curves are drawn on, created on first use.
+_FIG = None
 
 
 @contextmanager
 def tempfile(fname: str = "temp") -> Generator[Path, None, None]:
-    """Create a temporary file that is deleted on return.
+    """Provide a temporary file path that is deleted on return.
+
+    The file itself is not created; whatever writes to the path does that.
 
     Args:
-        fname: The name of the file to create.
+        fname: The name of the temporary file.
 
     """
     fpath = Path(fname)
-    with fpath.open("w"):
-        pass
     try:
-        yield Path(fname)
+        yield fpath
     finally:
-        os.remove(fpath)
+        fpath.unlink(missing_ok=True)
 
 
 def interpret_xtb(xtb_output):
@@ -38,8 +63,9 @@ def interpret_xtb(xtb_output):
         energy (float): The total energy value given by xtb.
 
     """
-    pattern = r"TOTAL ENERGY\s+(-?\d+\.\d+)"
-    match = re.search(pattern, xtb_output)
+    match = _TOTAL_E_RE.search(xtb_output, max(0, len(xtb_output) - _XTB_TAIL))
+    if match is None:
+        match = _TOTAL_E_RE.search(xtb_output)
 
     return float(match.group(1))
 
@@ -58,6 +84,20 @@ def resize_lat(array, scale):
     return scale ** (1 / 3) * array
 
 
+def resize_lat_batch(array, scales):
+    """Scale a lattice's volume by each of several factors.
+
+    Args:
+        array (:obj:`np.ndarray`): The lattice parameters.
+        scales (list of float): The scaling factors.
+
+    Returns:
+        scaled (:obj:`np.ndarray`): The scaled lattices, stacked along the first axis.
+
+    """
+    return np.cbrt(np.asarray(scales, dtype=np.float64))[:, None, None] * array
+
+
 def format_array(array):
     """Format an array nicely for templating.
 
@@ -70,56 +110,90 @@ def format_array(array):
         formatted (str): The formatted array.
 
     """
-    formatted = ""
-    template = "{}\t{}\t{}\n"
-    for rows in array:
-        formatted += template.format(*rows)
+    return "\n".join("\t".join(map(str, row)) for row in np.asarray(array).tolist())
 
-    formatted = formatted.rstrip("\n")
-    return formatted
 
-
-def run_xtb(fname):
+def run_xtb(fname, cwd=None):
     """Run GFN0 xTB with given file.
 
     Args:
         fname (str): The input atomic coordinate file.
+        cwd (str, optional): The directory xtb is run in, where it writes its
+            scratch files. Defaults to the current directory.
 
     Returns:
         xtb results (str): The xtb code output.
 
     """
     res = subprocess.run(
-        ["cd", str(Path(__file__)), "&&", "xtb", "--gfn", "0", fname],
-        capture_output=True,
+        ["xtb", "--gfn", "0", str(fname)],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
         text=True,
+        cwd=cwd,
     )
     return res.stdout
 
 
-def run_xtb_opt(fname):
-    """Run GFN0 xTB with geometry optimization with to produce "xtbopt.vasp" file and move it to /data.
+def run_and_parse_xtb(fname, cwd=None, env=None):
+    """Run GFN0 xTB with given file and read the total energy as it is printed.
+
+    The xtb output is streamed, and the run is left as soon as the total
+    energy line has been seen rather than buffering the whole output.
 
     Args:
         fname (str): The input atomic coordinate file.
+        cwd (str, optional): The directory xtb is run in, where it writes its
+            scratch files. Defaults to the current directory.
+        env (dict, optional): The environment xtb is run with. Defaults to
+            the environment of this process.
+
+    Returns:
+        energy (float): The total energy value given by xtb.
+
+    """
+    with subprocess.Popen(
+        ["xtb", "--gfn", "0", str(fname)],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        cwd=cwd,
+        env=env,
+    ) as proc:
+        # The output is left undecoded; float() parses the matched bytes.
+        for line in proc.stdout:
+            match = _TOTAL_E_RE_BYTES.search(line)
+            if match is not None:
+                return float(match.group(1))
+
+    raise RuntimeError(f"xtb did not report a total energy for {fname}")
+
+
+def run_xtb_opt(fname, cwd=None):
+    """Run GFN0 xTB with geometry optimization with to produce "xtbopt.vasp" file.
+
+    Args:
+        fname (str): The input atomic coordinate file.
+        cwd (str, optional): The directory xtb is run in, where "xtbopt.vasp"
+            is written. Defaults to the current directory.
+
+    Raises:
+        subprocess.CalledProcessError: If the optimization fails.
     """
     subprocess.run(
         [
-            "cd",
-            str(Path(__file__)),
-            "&&",
             "xtb",
             "--gfn",
             "0",
-            fname,
+            os.path.abspath(fname),
             "-o",
             "--cycles",
             "1000",
         ],
-        capture_output=True,
-        text=True,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        cwd=cwd,
+        check=True,
     )
-    # subprocess.run(["mv", "xtbopt.vasp", "./evxtb"], capture_output=True, text=True)
 
 
 def unit_vol(lat_params):
@@ -132,10 +206,13 @@ def unit_vol(lat_params):
         volume (float): The cell volume.
 
     """
-    a = lat_params[0, :]
-    b = lat_params[1, :]
-    c = lat_params[2, :]
-    return np.dot(np.cross(a, b), c)
+    # Written out as (a x b) . c on plain floats, which avoids the NumPy call
+    # overhead that dominates for a 3x3 matrix. The result can differ from
+    # np.dot(np.cross(a, b), c) in the last few bits.
+    (a0, a1, a2), (b0, b1, b2), (c0, c1, c2) = np.asarray(lat_params).tolist()
+    return (
+        (a1 * b2 - a2 * b1) * c0 + (a2 * b0 - a0 * b2) * c1 + (a0 * b1 - a1 * b0) * c2
+    )
 
 
 def find_repeat_unit(fname):
@@ -148,19 +225,185 @@ def find_repeat_unit(fname):
         rnum (int): The number of repeat units in the cell.
 
     """
-    vasp_handler = VaspHandler(fname)
-
-    rnum = np.gcd.reduce(vasp_handler.read_vasp_repeats())
+    rnum = np.gcd.reduce(VaspHandler(fname).chem_ints)
 
     return rnum
 
 
-def xtbev(fname, sfs):
+def _run_xtb_cells(buffers, max_workers=None):
+    """Run the xtb program concurrently on several VASP cells.
+
+    Each cell is written to its own directory inside a fresh temporary
+    working directory, so that the xtb runs, and the scratch files xtb leaves
+    behind, are independent of one another and can be dispatched in parallel.
+    When several runs are dispatched at once, each xtb process is limited to
+    its share of the CPUs through ``OMP_NUM_THREADS``, so that the OpenMP
+    threads of concurrent runs do not oversubscribe the machine. An existing
+    ``OMP_NUM_THREADS`` is kept as an upper limit on that share.
+
+    Args:
+        buffers (list of str): The contents of the VASP files to run.
+        max_workers (int, optional): The number of concurrent xtb runs.
+            Defaults to the number of CPUs.
+
+    Returns:
+        energies (list of float): The xtb total energies, in the order of ``buffers``.
+
+    """
+    workdir = Path(mkdtemp(prefix="xtbev_"))
+    try:
+        run_dirs = []
+        for idx, buffer in enumerate(buffers):
+            run_dir = workdir / f"s{idx:03d}"
+            run_dir.mkdir()
+            with open(run_dir / f"s{idx:03d}.vasp", "w") as f:
+                f.write(buffer)
+            run_dirs.append(run_dir)
+
+        ncpus = os.cpu_count() or 1
+        if max_workers is None:
+            max_workers = ncpus
+        max_workers = max(1, min(len(run_dirs), max_workers))
+
+        env = None
+        if max_workers > 1:
+            threads = max(1, ncpus // max_workers)
+            user_threads = os.environ.get("OMP_NUM_THREADS")
+            if user_threads is not None:
+                try:
+                    threads = min(threads, int(user_threads))
+                except ValueError:
+                    # Leave settings other than a plain count, e.g. nested
+                    # "4,2", to the user.
+                    threads = None
+            if threads is not None:
+                env = {**os.environ, "OMP_NUM_THREADS": str(threads)}
+
+        def run(run_dir):
+            return run_and_parse_xtb(f"{run_dir.name}.vasp", cwd=run_dir, env=env)
+        # xtb does its work in a subprocess, so threads are enough to run the
+        # calculations concurrently.
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            return list(pool.map(run, run_dirs))
+    finally:
+        shutil.rmtree(workdir)
+
+
+def _run_xtb_python(buffers):
+    """Calculate GFN0 xTB energies of several VASP cells in-process with xtb-python.
+
+    A single calculator is set up and updated with the positions and lattice
+    of each cell, so no process has to be started per cell. The cells are
+    read from the same VASP buffers the xtb program would be given, so both
+    backends calculate the same structures.
+
+    Args:
+        buffers (list of str): The contents of the VASP files to calculate.
+
+    Returns:
+        energies (list of float): The total energies, in the order of ``buffers``.
+
+    """
+    try:
+        from xtb.interface import Calculator, Param
+        from xtb.libxtb import VERBOSITY_MUTED
+    except ImportError as err:
+        raise ImportError(
+            'The "xtb-python" backend requires the xtb-python package.'
+        ) from err
+    from ase.io.vasp import read_vasp
+    from ase.units import Bohr
+
+    calc = None
+    energies = []
+    for buffer in buffers:
+        atoms = read_vasp(io.StringIO(buffer))
+        positions = atoms.get_positions() / Bohr
+        lattice = atoms.get_cell().array / Bohr
+
+        if calc is None:
+            calc = Calculator(
+                Param.GFN0xTB,
+                atoms.get_atomic_numbers(),
+                positions,
+                lattice=lattice,
+                periodic=np.array([True, True, True]),
+            )
+            calc.set_verbosity(VERBOSITY_MUTED)
+        else:
+            calc.update(positions, lattice)
+        energies.append(calc.singlepoint().get_energy())
+
+    return energies
+
+
+def _sweep_energies(
+    vasp_handler, sfs, max_workers=None, use_cache=True, backend="xtb",
+):
+    """Calculate the xtb energy of every scaled cell of a VASP template.
+
+    Cells already calculated in an earlier sweep are read from the energy
+    cache instead of being run again.
+
+    Args:
+        vasp_handler (:obj:`VaspHandler`): The handler for the template cell.
+        sfs (list of float): The scaling factors applied to the cell volume.
+        max_workers (int, optional): The number of concurrent xtb runs.
+            Defaults to the number of CPUs.
+        use_cache (bool): Whether to look up and store energies in the cache.
+        backend (str): Either "xtb", to run the xtb program, or "xtb-python",
+            to calculate the energies in-process.
+
+    Returns:
+        energies (list of float): The xtb total energies, in the order of ``sfs``.
+
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend {backend!r}, expected one of {BACKENDS}")
+
+    all_scaled = resize_lat_batch(vasp_handler.lat_params, sfs)
+    buffers = [vasp_handler.format_vasp(scaled) for scaled in all_scaled]
+
+    energies = [None] * len(buffers)
+    if use_cache:
+        version = xtb_version(backend)
+        keys = [cache_key(buffer, backend, version) for buffer in buffers]
+        with open_cache() as cache:
+            for idx, key in enumerate(keys):
+                energies[idx] = cache.get(key)
+
+    todo = [idx for idx, energy in enumerate(energies) if energy is None]
+    if not todo:
+        return energies
+
+    todo_buffers = [buffers[idx] for idx in todo]
+    if backend == "xtb-python":
+        new_energies = _run_xtb_python(todo_buffers)
+    else:
+        new_energies = _run_xtb_cells(todo_buffers, max_workers)
+
+    for idx, energy in zip(todo, new_energies):
+        energies[idx] = energy
+
+    if use_cache:
+        with open_cache() as cache:
+            for idx in todo:
+                cache[keys[idx]] = energies[idx]
+
+    return energies
+
+
+def xtbev(fname, sfs, max_workers=None, use_cache=True, backend="xtb"):
     """Calculate multiple total energies from differently scaled unit cells.
 
     Args:
         fname (str): The input atomic coordinate file.
         sfs (list of float): The scaling factors that will be applied to the unit cell volume.
+        max_workers (int, optional): The number of xtb calculations run at once.
+            Defaults to the number of CPUs.
+        use_cache (bool): Whether to reuse energies of cells calculated before.
+        backend (str): Either "xtb", to run the xtb program for each cell, or
+            "xtb-python", to calculate the energies in-process with xtb-python.
 
     Returns:
         volumes (list of float): The volumes correlated to the energies calculated.
@@ -168,50 +411,93 @@ def xtbev(fname, sfs):
 
     """
     vasp_handler = VaspHandler(fname)
-    rnum = find_repeat_unit(fname)
+    rnum = np.gcd.reduce(vasp_handler.chem_ints)
     print("Number of stoichiometric units = ", rnum)
 
-    energies = []
-    volumes = []
-    for sf in sfs:
-        fname = "temp.vasp"
-        vasp_handler.write_vasp(sf, fname)
+    sfs_np = np.asarray(sfs, dtype=np.float64)
+    v0 = unit_vol(vasp_handler.lat_params)
 
-        energies.append(interpret_xtb(run_xtb(fname)) / rnum)
-        volumes.append(unit_vol(vasp_handler.lat_params) * sf)
+    raw_energies = _sweep_energies(
+        vasp_handler, sfs, max_workers, use_cache, backend
+    )
+    energies = [e / rnum for e in raw_energies]
+    volumes = (v0 * sfs_np).tolist()
 
     return volumes, energies
 
 
-def xtbev_opt(fname, sfs):
-    """Calculate multiple total energies from differently scaled unit cells.
+def xtbev_opt(fname, sfs, max_workers=None, use_cache=True, backend="xtb"):
+    """Calculate multiple total energies from differently scaled optimized unit cells.
+
+    The cell is first geometry optimized with xtb in a temporary working
+    directory, and the E(V) curve is then calculated from the optimized
+    "xtbopt.vasp" with :func:`xtbev`.
 
     Args:
         fname (str): The input atomic coordinate file.
         sfs (list of float): The scaling factors that will be applied to the unit cell volume.
+        max_workers (int, optional): The number of xtb calculations run at once.
+            Defaults to the number of CPUs.
+        use_cache (bool): Whether to reuse energies of cells calculated before.
+        backend (str): Either "xtb", to run the xtb program for each cell, or
+            "xtb-python", to calculate the energies in-process with xtb-python.
 
     Returns:
         volumes (list of float): The volumes correlated to the energies calculated.
         energies (list of float): The energies the cell calculated by gfn0 xtb then divided by number of repeat chemical units.
 
     """
-    run_xtb_opt(fname)
-    fname = "xtbopt.vasp"
+    workdir = Path(mkdtemp(prefix="xtbopt_"))
+    try:
+        run_xtb_opt(fname, cwd=workdir)
 
-    vasp_handler = VaspHandler(fname)
-    rnum = find_repeat_unit(fname)
-    print("Number of stoichiometric units = ", rnum)
+        return xtbev(str(workdir / "xtbopt.vasp"), sfs, max_workers, use_cache, backend)
+    finally:
+        shutil.rmtree(workdir)
 
-    energies = []
-    volumes = []
-    for sf in sfs:
-        with tempfile("temp.vasp") as temp:
-            vasp_handler.write_vasp(sf, temp)
 
-            energies.append(interpret_xtb(run_xtb(str(temp))) / rnum)
-            volumes.append(unit_vol(vasp_handler.lat_params) * sf)
+def _fit_eos(eos, key):
+    """Fit a Murnaghan equation of state, starting from the last fit for a key.
 
-    return volumes, energies
+    The fit of the first curve for a key starts from ase's own initial guess;
+    later fits of closely related curves start from the previous parameters.
+    A warm start is only tried if the previous minimum volume lies within the
+    new volumes, and its result is only kept if the bulk modulus is positive
+    and the fitted minimum volume lies within the volumes. Otherwise ase's
+    fit is used, which also warns if the minimum is outside the volumes.
+
+    Args:
+        eos (:obj:`EquationOfState`): The Murnaghan equation of state to fit.
+        key: The name the parameters are remembered under.
+
+    Returns:
+        v0 (float): The volume of minimum energy.
+        e0 (float): The fitted minimum energy of the V/E curve.
+        B (float): The fitted bulk modulus.
+
+    """
+    minvol, maxvol = min(eos.v), max(eos.v)
+
+    popt = None
+    p0 = _LAST_FIT.get(key)
+    if p0 is not None and minvol < p0[3] < maxvol:
+        try:
+            popt, _ = curve_fit(murnaghan, eos.v, eos.e, p0)
+        except RuntimeError:
+            popt = None
+
+    if popt is not None and not (popt[1] > 0 and minvol < popt[3] < maxvol):
+        popt = None
+
+    if popt is None:
+        eos.fit()
+    else:
+        eos.func = murnaghan
+        eos.eos_parameters = popt
+        eos.e0, eos.B, _, eos.v0 = popt
+
+    _LAST_FIT[key] = tuple(eos.eos_parameters)
+    return eos.v0, eos.e0, eos.B
 
 
 def ev_bulk(volumes, energies, plot_name):
@@ -220,7 +506,7 @@ def ev_bulk(volumes, energies, plot_name):
     Args:
         volumes (list of float): The volumes correlated to the energies calculated.
         energies (list of float): The energies the cell calculated by gfn0 xtb.
-        plot_name (str): The file name the plot is saved to. 
+        plot_name (str): The file name the plot is saved to, or None to skip plotting.
 
     Returns:
         v0 (float): The volume of minimum energy.
@@ -228,18 +514,88 @@ def ev_bulk(volumes, energies, plot_name):
         B (float): The calculated bulk modulus. 
 
     """
-    volumes = np.array(volumes)
-    energies = np.array(energies) * Hartree / eV
+    global _FIG
+
+    volumes = np.asarray(volumes)
+    energies = np.multiply(np.asarray(energies), _H2EV)
     eos = EquationOfState(volumes, energies, eos="murnaghan")
-    v0, e0, B = eos.fit()
-    print(B / kJ * 1.0e24, "GPa")  # Converts into GPa
-    ax = eos.plot()
-    fig = plt.gcf()
-    fig.set_size_inches(8, 5)
-    fig.savefig(plot_name)
+    v0, e0, B = _fit_eos(eos, plot_name)
+    print(B * _KJ_TO_GPa, "GPa")  # Converts into GPa
+    if plot_name is not None:
+        if _FIG is None:
+            # Drawn without pyplot, so no GUI backend is involved.
+            _FIG = Figure(figsize=(8, 5))
+        _FIG.clf()
+        eos.plot(ax=_FIG.add_subplot(111))
+        _FIG.savefig(plot_name)
     return v0, e0, B
 
 
+class VaspData(NamedTuple):
+    """The parsed contents of a VASP file.
+
+    Attributes:
+        lat_params (:obj:`np.ndarray`): The lattice matrix.
+        template (str): The template of the VASP file, sans lattice parameter.
+        chem_ints (:obj:`np.ndarray`): The numbers of atoms of each element.
+
+    """
+
+    lat_params: np.ndarray
+    template: str
+    chem_ints: np.ndarray
+
+
+@functools.lru_cache(maxsize=32)
+def _load_vasp(path, key):
+    """Read and parse a VASP file.
+
+    Results are cached, so ``key`` should identify the version of the file,
+    e.g. its modification time and size, for changes to be picked up.
+
+    Args:
+        path (str): The absolute path of the VASP file.
+        key (tuple): The cache key of the file's current contents.
+
+    Returns:
+        data (:obj:`VaspData`): The parsed file, with read-only arrays.
+
+    """
+    with open(path, "r") as f:
+        buffer = f.read()
+
+    lines = buffer.split("\n")
+
+    # Get the lattice parameters
+    lat_params = np.array(" ".join(lines[2:5]).split(), dtype=float).reshape(3, 3)
+
+    # Get the rest of the template
+    rest = lines[:2] + ["{}"] + lines[5:]
+    template = "\n".join(rest)
+
+    # Get the numbers of atoms
+    chem_ints = np.array(lines[6].split(), dtype=np.int64)
+
+    lat_params.flags.writeable = False
+    chem_ints.flags.writeable = False
+    return VaspData(lat_params, template, chem_ints)
+
+
+def read_vasp(fname):
+    """Read a VASP file, reusing the parsed contents if it is unchanged.
+
+    Args:
+        fname (str): The VASP file name.
+
+    Returns:
+        data (:obj:`VaspData`): The parsed file, with read-only arrays.
+
+    """
+    path = os.path.abspath(fname)
+    stat = os.stat(path)
+    return _load_vasp(path, (stat.st_mtime_ns, stat.st_size))
+
+
 class VaspHandler:
     """Handler for VASP inputs and lattice scaling.
 
@@ -250,44 +606,30 @@ class VaspHandler:
         fname (str): The input template file.
         lat_params (:obj:`np.ndarray`): The lattice matrix.
         template (str): The template of the VASP file, sans lattice parameter.
+        chem_ints (:obj:`np.ndarray`): The numbers of atoms of each element.
 
     """
 
     def __init__(self, fname):
         self.fname = fname
 
-        self.lat_params, self.template = self.read_vasp_lat()
+        self.lat_params, self.template, self.chem_ints = self._parse()
 
-    def read_vasp_lat(self):
-        """Read the class's VASP file and get the lattice parameter."""
-        with open(self.fname, "r") as f:
-            buffer = f.read()
+    def _parse(self):
+        """Read the class's VASP file in a single pass."""
+        data = read_vasp(self.fname)
 
-        lines = buffer.split("\n")
+        return data.lat_params.copy(), data.template, data.chem_ints.copy()
 
-        # Get the lattice parameters
-        elems = lines[2:5]
-        rows = [[float(num) for num in line.split()] for line in elems]
-        lat_params = np.array(rows)
-
-        # Get the rest of the template
-        rest = lines[:2] + ["{}"] + lines[5:]
-        template = "\n".join(rest)
+    def read_vasp_lat(self):
+        """Read the class's VASP file and get the lattice parameter."""
+        lat_params, template, _ = self._parse()
 
         return lat_params, template
 
     def read_vasp_repeats(self):
         """Read the class's VASP file and get the numbers of atoms in the cell."""
-        with open(self.fname, "r") as f:
-            buffer = f.read()
-
-        lines = buffer.split("\n")
-
-        elem = lines[6]
-        row = [int(num) for num in elem.split()]
-        chem_ints = np.array(row)
-
-        return chem_ints
+        return self._parse()[2]
 
     def write_vasp(self, sf, fname):
         """Write to a VASP file with a scaled lattice parameter.
@@ -299,7 +641,19 @@ class VaspHandler:
         """
         scaled = resize_lat(self.lat_params, sf)
 
-        buffer = self.template.format(format_array(scaled))
+        buffer = self.format_vasp(scaled)
 
         with open(fname, "w") as f:
             f.write(buffer)
+
+    def format_vasp(self, lat_params):
+        """Fill the class's VASP template with a lattice parameter.
+
+        Args:
+            lat_params (:obj:`np.ndarray`): The lattice matrix.
+
+        Returns:
+            buffer (str): The VASP file contents.
+
+        """
+        return self.template.format(format_array(lat_params))
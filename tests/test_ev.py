@@ -1,9 +1,17 @@
 """Test unit functionality."""
+import os
+import sys
+import types
+from pathlib import Path
+
 import numpy as np
 import pytest
 from scipy.spatial.transform import Rotation as R
 
 import evxtb.xtb_ev as evxtb
+from evxtb._cache import cache_key, open_cache
+
+TIO2 = str(Path(__file__).parents[1] / "examples" / "data" / "TiO2_Beta.vasp")
 
 
 def test_scale():
@@ -15,6 +23,18 @@ def test_scale():
     assert (evxtb.resize_lat(test_array, test_sf) == expected).all()
 
 
+def test_scale_batch():
+    """Test that batch scaling matches scaling each factor on its own."""
+    test_array = np.arange(9.0).reshape(3, 3)
+    test_sfs = [0.5, 1, 8]
+
+    scaled = evxtb.resize_lat_batch(test_array, test_sfs)
+
+    assert scaled.shape == (3, 3, 3)
+    for sf, lat in zip(test_sfs, scaled):
+        assert np.allclose(lat, evxtb.resize_lat(test_array, sf))
+
+
 @pytest.mark.parametrize(
     "array,expected",
     [
@@ -36,3 +56,310 @@ rot45 = R.from_euler("z", 45, degrees=True)
 def test_volume(array, expected):
     """Test that a volume is correctly calculated."""
     assert evxtb.unit_vol(array) == expected
+
+
+def test_volume_matches_numpy():
+    """Test that the volume agrees with NumPy's triple product to rounding error."""
+    rng = np.random.default_rng(0)
+    for lat in np.eye(3) + 0.3 * rng.standard_normal((1000, 3, 3)):
+        expected = np.dot(np.cross(lat[0], lat[1]), lat[2])
+        assert evxtb.unit_vol(lat) == pytest.approx(expected, rel=1e-10)
+
+
+def test_read_vasp():
+    """Test that a VASP file is parsed into its lattice, template and atom counts."""
+    handler = evxtb.VaspHandler(TIO2)
+
+    assert handler.lat_params == pytest.approx(
+        np.array(
+            [
+                [6.4353680611, 0.0, 0.0],
+                [5.3328820859, 3.6019898305, 0.0],
+                [1.8438885205, 0.5643717304, 6.3289671963],
+            ]
+        )
+    )
+    assert (handler.chem_ints == [4, 8]).all()
+    assert handler.template.split("\n")[:4] == ["Ti4 O8", "1.0", "{}", "   Ti    O"]
+
+
+def test_read_vasp_cache(tmp_path):
+    """Test that cached VASP files are re-read once they change."""
+    lines = Path(TIO2).read_text().split("\n")
+    fname = tmp_path / "cell.vasp"
+    fname.write_text("\n".join(lines))
+
+    data = evxtb.read_vasp(str(fname))
+    assert evxtb.read_vasp(str(fname)) is data
+    assert not data.lat_params.flags.writeable
+    assert not data.chem_ints.flags.writeable
+
+    handler = evxtb.VaspHandler(str(fname))
+    assert handler.lat_params.flags.writeable
+    assert handler.chem_ints.flags.writeable
+    handler.lat_params *= 2
+    assert (evxtb.read_vasp(str(fname)).lat_params == handler.lat_params / 2).all()
+
+    fname.write_text("\n".join(lines[:2] + ["10 0 0", "0 10 0", "0 0 10"] + lines[5:]))
+    stat = fname.stat()
+    os.utime(fname, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    data = evxtb.read_vasp(str(fname))
+    assert (data.lat_params == 10 * np.eye(3)).all()
+    assert (evxtb.VaspHandler(str(fname)).lat_params == 10 * np.eye(3)).all()
+
+
+def test_read_vasp_invalid(tmp_path):
+    """Test that a file without atom counts on the seventh line is rejected."""
+    lines = Path(TIO2).read_text().split("\n")
+    fname = tmp_path / "vasp4.vasp"
+    fname.write_text("\n".join(lines[:5] + lines[6:]))
+
+    with pytest.raises(ValueError):
+        evxtb.VaspHandler(str(fname))
+
+
+@pytest.mark.parametrize(
+    "output,expected",
+    [
+        ("| TOTAL ENERGY   -42.123456789 Eh   |", -42.123456789),
+        ("| TOTAL ENERGY   -1.5 Eh   |" + " " * 10000, -1.5),
+        (" " * 10000 + "| TOTAL ENERGY   -1.5 Eh   |", -1.5),
+    ],
+)
+def test_interpret(output, expected):
+    """Test that the total energy is found in the xtb output."""
+    assert evxtb.interpret_xtb(output) == expected
+
+
+def test_cache(tmp_path):
+    """Test that energies are stored and found by the input they came from."""
+    key = cache_key("input")
+    assert key == cache_key("input")
+    assert key != cache_key("input", backend="xtb-python")
+    assert key != cache_key("input", version="6.3.2")
+
+    with open_cache(tmp_path) as cache:
+        cache[key] = -1.5
+    with open_cache(tmp_path) as cache:
+        assert cache.get(key) == -1.5
+        assert cache.get(cache_key("other")) is None
+
+
+def test_ev_bulk_warm_start():
+    """Test that refitting a curve from the previous fit gives the same result."""
+    from ase.eos import murnaghan
+    from ase.units import Hartree, eV
+
+    volumes = np.linspace(20, 30, 9)
+    energies = murnaghan(volumes, -10, 0.5, 4.0, 25) * eV / Hartree
+
+    first = evxtb.ev_bulk(volumes, energies, None)
+    second = evxtb.ev_bulk(volumes, energies, None)
+
+    assert first == pytest.approx((25, -10, 0.5))
+    assert second == pytest.approx(first)
+
+
+def test_ev_bulk_warm_start_unrelated():
+    """Test that unrelated curves fitted under the same name match a cold fit."""
+    from ase.eos import EquationOfState, murnaghan
+    from ase.units import Hartree, eV
+
+    volumes = np.linspace(20, 30, 9)
+    energies = murnaghan(volumes, -10, 0.5, 4.0, 25) * eV / Hartree
+    evxtb.ev_bulk(volumes, energies, None)
+
+    volumes = np.linspace(150, 250, 9)
+    energies = murnaghan(volumes, -50, 0.05, 4.0, 200) * eV / Hartree
+    fitted = evxtb.ev_bulk(volumes, energies, None)
+
+    cold = EquationOfState(volumes, energies * Hartree / eV, eos="murnaghan").fit()
+    assert fitted == pytest.approx(cold)
+    assert fitted == pytest.approx((200, -50, 0.05))
+
+
+def test_ev_bulk_warm_start_out_of_range():
+    """Test that a minimum outside the volumes is still warned about."""
+    from ase.eos import murnaghan
+    from ase.units import Hartree, eV
+
+    volumes = np.linspace(20, 30, 9)
+    energies = murnaghan(volumes, -10, 0.5, 4.0, 25) * eV / Hartree
+    evxtb.ev_bulk(volumes, energies, None)
+
+    volumes = np.linspace(10, 18, 9)
+    energies = murnaghan(volumes, -10, 0.5, 4.0, 25) * eV / Hartree
+    with pytest.warns(UserWarning, match="not in your volumes"):
+        evxtb.ev_bulk(volumes, energies, None)
+
+
+def test_tempfile(tmp_path):
+    """Test that the temporary file is removed, whether or not it was written."""
+    with evxtb.tempfile(tmp_path / "temp.vasp") as temp:
+        temp.write_text("")
+    assert not temp.exists()
+
+    with evxtb.tempfile(tmp_path / "unused.vasp") as temp:
+        pass
+    assert not temp.exists()
+
+
+def fake_xtb(calls):
+    """Make a stand-in for xtb that returns the volume of the cell it is given."""
+
+    def run_and_parse_xtb(fname, cwd=None, env=None):
+        calls.append((Path(cwd), env))
+        return evxtb.unit_vol(evxtb.VaspHandler(str(Path(cwd) / fname)).lat_params)
+
+    return run_and_parse_xtb
+
+
+@pytest.mark.parametrize("user_threads", [None, "1", "1000"])
+def test_xtbev(monkeypatch, user_threads):
+    """Test that the sweep runs every cell in its own directory, in order."""
+    calls = []
+    monkeypatch.setattr(evxtb, "run_and_parse_xtb", fake_xtb(calls))
+    if user_threads is None:
+        monkeypatch.delenv("OMP_NUM_THREADS", raising=False)
+    else:
+        monkeypatch.setenv("OMP_NUM_THREADS", user_threads)
+    sfs = [1.05, 0.8, 1.0, 0.9]
+
+    volumes, energies = evxtb.xtbev(TIO2, sfs, max_workers=2, use_cache=False)
+
+    v0 = evxtb.unit_vol(evxtb.VaspHandler(TIO2).lat_params)
+    assert volumes == pytest.approx([v0 * sf for sf in sfs])
+    # The cell holds four TiO2 units.
+    assert energies == pytest.approx([volume / 4 for volume in volumes])
+
+    run_dirs = {cwd for cwd, _ in calls}
+    assert len(run_dirs) == len(sfs)
+    assert not any(run_dir.exists() for run_dir in run_dirs)
+    # A user's OMP_NUM_THREADS caps each run's share of the CPUs.
+    threads = max(1, os.cpu_count() // 2)
+    if user_threads is not None:
+        threads = min(threads, int(user_threads))
+    assert all(env["OMP_NUM_THREADS"] == str(threads) for _, env in calls)
+
+
+def test_xtbev_failure(monkeypatch):
+    """Test that the working directory is removed when an xtb run fails."""
+    calls = []
+    run = fake_xtb(calls)
+
+    def failing(fname, cwd=None, env=None):
+        run(fname, cwd, env)
+        raise RuntimeError("xtb failed")
+
+    monkeypatch.setattr(evxtb, "run_and_parse_xtb", failing)
+
+    with pytest.raises(RuntimeError):
+        evxtb.xtbev(TIO2, [0.9, 1.0], use_cache=False)
+
+    assert calls
+    assert not calls[0][0].parent.exists()
+
+
+def test_xtbev_opt(monkeypatch, tmp_path):
+    """Test that the optimization runs outside the current directory."""
+    opt_dirs = []
+
+    def run_xtb_opt(fname, cwd=None):
+        opt_dirs.append(Path(cwd))
+        (Path(cwd) / "xtbopt.vasp").write_text(Path(fname).read_text())
+
+    monkeypatch.setattr(evxtb, "run_xtb_opt", run_xtb_opt)
+    monkeypatch.setattr(evxtb, "run_and_parse_xtb", fake_xtb([]))
+    monkeypatch.chdir(tmp_path)
+
+    volumes, _ = evxtb.xtbev_opt(TIO2, [1.0], use_cache=False)
+
+    v0 = evxtb.unit_vol(evxtb.VaspHandler(TIO2).lat_params)
+    assert volumes == pytest.approx([v0])
+    assert not opt_dirs[0].exists()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_cache_unavailable(tmp_path):
+    """Test that an unusable cache directory does not stop the calculation."""
+    blocker = tmp_path / "file"
+    blocker.write_text("")
+
+    with pytest.warns(UserWarning, match="unavailable"):
+        with open_cache(blocker / "evxtb") as cache:
+            cache[cache_key("input")] = -1.5
+
+
+def fake_xtb_python(monkeypatch, cells):
+    """Install a stand-in for xtb-python that returns the volume of each cell."""
+
+    class Calculator:
+        def __init__(self, param, numbers, positions, lattice=None, periodic=None):
+            self.update(positions, lattice)
+
+        def set_verbosity(self, verbosity):
+            pass
+
+        def update(self, positions, lattice=None):
+            cells.append((positions, lattice))
+
+        def singlepoint(self):
+            lattice = cells[-1][1]
+            return types.SimpleNamespace(get_energy=lambda: evxtb.unit_vol(lattice))
+
+    interface = types.ModuleType("xtb.interface")
+    interface.Calculator = Calculator
+    interface.Param = types.SimpleNamespace(GFN0xTB=0)
+    libxtb = types.ModuleType("xtb.libxtb")
+    libxtb.VERBOSITY_MUTED = 0
+    monkeypatch.setitem(sys.modules, "xtb", types.ModuleType("xtb"))
+    monkeypatch.setitem(sys.modules, "xtb.interface", interface)
+    monkeypatch.setitem(sys.modules, "xtb.libxtb", libxtb)
+
+
+def test_xtbev_xtb_python(monkeypatch):
+    """Test that the xtb-python backend calculates the same cells as the program."""
+    from ase.io import read
+    from ase.units import Bohr
+
+    cells = []
+    fake_xtb_python(monkeypatch, cells)
+    monkeypatch.setattr(evxtb, "run_and_parse_xtb", None)
+    sfs = [1.05, 0.8, 1.0]
+
+    volumes, energies = evxtb.xtbev(TIO2, sfs, use_cache=False, backend="xtb-python")
+
+    assert energies == pytest.approx([v / Bohr ** 3 / 4 for v in volumes])
+    atoms = read(TIO2, format="vasp")
+    for sf, (positions, lattice) in zip(sfs, cells):
+        scaled = atoms.get_scaled_positions() @ lattice
+        assert np.allclose(lattice * Bohr, np.cbrt(sf) * atoms.get_cell().array)
+        assert np.allclose(positions, scaled)
+
+
+def test_xtbev_xtb_python_cartesian(monkeypatch, tmp_path):
+    """Test that Cartesian positions are left unscaled, as in the xtb input files."""
+    from ase.io import read, write
+    from ase.units import Bohr
+
+    fname = tmp_path / "cartesian.vasp"
+    write(fname, read(TIO2, format="vasp"), format="vasp", direct=False)
+    cells = []
+    fake_xtb_python(monkeypatch, cells)
+
+    evxtb.xtbev(str(fname), [0.8, 1.0], use_cache=False, backend="xtb-python")
+
+    atoms = read(fname, format="vasp")
+    for positions, _ in cells:
+        assert np.allclose(positions * Bohr, atoms.get_positions())
+
+
+def test_xtbev_backends(monkeypatch):
+    """Test that unknown and unavailable backends are reported."""
+    with pytest.raises(ValueError, match="Unknown backend"):
+        evxtb.xtbev(TIO2, [1.0], use_cache=False, backend="tblite")
+
+    monkeypatch.setitem(sys.modules, "xtb", None)
+    with pytest.raises(ImportError, match="xtb-python"):
+        evxtb.xtbev(TIO2, [1.0], use_cache=False, backend="xtb-python")